@@ -1,5 +1,6 @@
+import itertools
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from copy import deepcopy
 from numbers import Integral
 from typing import Any, Optional, Union
@@ -148,8 +149,9 @@ class BaseFingerprintTransformer(
         if copy:
             X = deepcopy(X)
 
-        n_jobs = effective_n_jobs(self.n_jobs)
-        if n_jobs == 1:
+        # don't start more workers than there are molecules
+        n_jobs = min(effective_n_jobs(self.n_jobs), len(X))
+        if n_jobs <= 1:
             if self.verbose:
                 results = [self._calculate_fingerprint([mol]) for mol in tqdm(X)]
             else:
@@ -161,13 +163,35 @@ class BaseFingerprintTransformer(
                 n_jobs=n_jobs,
                 batch_size=self.batch_size,
                 verbose=self.verbose,
+                return_as="generator",
             )
+            if not self.sparse:
+                return self._write_batches(results, n_rows=len(X))
+            results = list(results)
 
         if isinstance(results, (np.ndarray, csr_array)):
             return results
         else:
             return scipy.sparse.vstack(results) if self.sparse else np.vstack(results)
 
+    @staticmethod
+    def _write_batches(batches: Iterable[np.ndarray], n_rows: int) -> np.ndarray:
+        """
+        Writes consecutive batches of fingerprints into a single output array as they
+        are computed, so that results of all batches are not kept in memory at once.
+        Output array is allocated based on the shape and dtype of the first batch.
+        """
+        batches = iter(batches)
+        first_batch = next(batches)
+        X_out = np.empty((n_rows, *first_batch.shape[1:]), dtype=first_batch.dtype)
+
+        start = 0
+        for batch in itertools.chain([first_batch], batches):
+            X_out[start : start + len(batch)] = batch
+            start += len(batch)
+
+        return X_out
+
     @abstractmethod
     def _calculate_fingerprint(
         self, X: Sequence[Union[str, Mol]]
@@ -41,7 +41,7 @@ class BaseSubstructureFingerprint(BaseFingerprintTransformer):
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     verbose : int or dict, default=0
         Controls the verbosity when computing fingerprints.
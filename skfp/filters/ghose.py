@@ -39,7 +39,7 @@ class GhoseFilter(BaseFilter):
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     verbose : int or dict, default=0
         Controls the verbosity when filtering molecules.
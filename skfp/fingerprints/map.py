@@ -1,6 +1,3 @@
-import hashlib
-import itertools
-import struct
 from collections import defaultdict
 from collections.abc import Sequence
 from numbers import Integral
@@ -8,6 +5,7 @@ from typing import Optional, Union
 
 import numpy as np
 from datasketch import MinHash
+from numba import njit
 from rdkit.Chem import Mol, MolToSmiles, PathToSubmol
 from rdkit.Chem.rdmolops import FindAtomEnvironmentOfRadiusN, GetDistanceMatrix
 from scipy.sparse import csr_array
@@ -49,9 +47,9 @@ class MAPFingerprint(BaseFingerprintTransformer):
         Another common notation uses diameter, therefore MAP4 has radius 2.
 
     variant : {"raw_hashes", "bit", "count"}, default="bit"
-        Which variant to fingerprint to use. ``"raw_hashes"`` returns MinHash values.
-        ``"bit"`` folds values into binary vector, and ``"count"`` uses folding with
-        counting.
+        Which variant to fingerprint to use. ``"raw_hashes"`` returns MinHash values,
+        which are 32-bit unsigned integers. ``"bit"`` folds values into binary vector,
+        and ``"count"`` uses folding with counting.
 
     sparse : bool, default=False
         Whether to return dense NumPy array, or sparse SciPy CSR array.
@@ -64,7 +62,7 @@ class MAPFingerprint(BaseFingerprintTransformer):
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     verbose : int or dict, default=0
         Controls the verbosity when computing fingerprints.
@@ -145,129 +143,386 @@ class MAPFingerprint(BaseFingerprintTransformer):
         self, X: Sequence[Union[str, Mol]]
     ) -> Union[np.ndarray, csr_array]:
         X = ensure_mols(X)
-        X = np.stack(
-            [self._calculate_single_mol_fingerprint(mol) for mol in X], dtype=int
-        )
+
+        if self.sparse and self.variant != "raw_hashes":
+            return self._calculate_sparse_fingerprint(X)
 
         if self.variant == "bit":
-            X = (X > 0).astype(np.uint8)
-        elif self.variant == "count":
-            X = X.astype(np.uint32)
+            dtype = np.uint8
+        else:
+            dtype = np.uint32
 
-        return csr_array(X) if self.sparse else np.array(X)
+        # rows are written directly into the final array, without temporary copies
+        X_fp = np.empty((len(X), self.fp_size), dtype=dtype)
 
-    def _calculate_single_mol_fingerprint(self, mol: Mol) -> np.ndarray:
-        atoms_envs = self._get_atom_envs(mol)
-        shingles = self._get_atom_pair_shingles(mol, atoms_envs)
+        # duplicated molecules, common e.g. in screening data, are computed only once
+        computed_rows: dict[str, int] = {}
+        for idx, mol in enumerate(X):
+            smiles = MolToSmiles(mol)
+            if smiles in computed_rows:
+                X_fp[idx] = X_fp[computed_rows[smiles]]
+                continue
+
+            fp = self._calculate_single_mol_fingerprint(mol)
+            X_fp[idx] = (fp > 0) if self.variant == "bit" else fp
+            computed_rows[smiles] = idx
+
+        return csr_array(X_fp) if self.sparse else X_fp
+
+    def _calculate_sparse_fingerprint(self, X: list[Mol]) -> csr_array:
+        """
+        Builds CSR array directly from nonzero positions of folded fingerprints,
+        without the intermediate dense array.
+        """
+        dtype = np.uint8 if self.variant == "bit" else np.uint32
+
+        rows_bits: list[np.ndarray] = []
+        rows_values: list[np.ndarray] = []
+        indptr = np.zeros(len(X) + 1, dtype=np.int64)
+
+        # duplicated molecules, common e.g. in screening data, are computed only once
+        computed_rows: dict[str, int] = {}
+        for idx, mol in enumerate(X):
+            smiles = MolToSmiles(mol)
+            if smiles in computed_rows:
+                bits = rows_bits[computed_rows[smiles]]
+                values = rows_values[computed_rows[smiles]]
+            else:
+                hashes = self._get_folding_hashes(mol)
+                bits, counts = np.unique(hashes % self.fp_size, return_counts=True)
+                if self.variant == "bit":
+                    values = np.ones(len(bits), dtype=dtype)
+                else:
+                    values = counts.astype(dtype)
+                computed_rows[smiles] = idx
+
+            rows_bits.append(bits)
+            rows_values.append(values)
+            indptr[idx + 1] = indptr[idx] + len(bits)
 
+        return csr_array(
+            (np.concatenate(rows_values), np.concatenate(rows_bits), indptr),
+            shape=(len(X), self.fp_size),
+        )
+
+    def _calculate_single_mol_fingerprint(self, mol: Mol) -> np.ndarray:
         if self.variant == "raw_hashes":
+            distance_matrix = GetDistanceMatrix(mol)
+            atoms_envs = self._get_atom_envs(mol, distance_matrix)
+            buffer, offsets = self._get_atom_pair_shingles(atoms_envs, distance_matrix)
+            data = buffer.tobytes()
+            offsets = offsets.tolist()
+            shingles = [
+                data[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+            ]
             encoder = MinHash(num_perm=self.fp_size, seed=self.random_state)
             encoder.update_batch(shingles)
-            fp = encoder.digest()
+            # MinHash values are 32-bit, even though datasketch stores them as uint64
+            fp = encoder.digest().astype(np.uint32)
         else:
             # bit/count folded version from original MAP4 and MHFP implementation
-            hashes = [self._get_hash(shingle) for shingle in shingles]
-            bits = [hash_val % self.fp_size for hash_val in hashes]
-            fp = np.bincount(bits, minlength=self.fp_size)
+            hashes = self._get_folding_hashes(mol)
+            fp = _fold_hashes(hashes, self.fp_size)
 
         return fp
 
-    def _get_atom_envs(self, mol: Mol) -> dict[int, list[Optional[str]]]:
+    def _get_folding_hashes(self, mol: Mol) -> np.ndarray:
+        """
+        Get hashes of atom pair shingles, which are folded for bit and count variants.
+        """
+        distance_matrix = GetDistanceMatrix(mol)
+        atoms_envs = self._get_atom_envs(mol, distance_matrix)
+        buffer, offsets = self._get_atom_pair_shingles(atoms_envs, distance_matrix)
+
+        # 32-bit MurmurHash3 of all shingles at once, without Python-level loop
+        hashes = _murmurhash3_32_batch(buffer, offsets, 0)
+        if self.variant == "count":
+            hashes = self._combine_hashes_with_counts(hashes)
+
+        return hashes
+
+    def _get_atom_envs(
+        self, mol: Mol, distance_matrix: np.ndarray
+    ) -> dict[int, list[Optional[bytes]]]:
         """
         For each atom get its environment, i.e. radius-hop neighborhood.
         """
+        max_radii = self._get_max_radii(distance_matrix)
+
         atoms_env = defaultdict(list)
         for atom in mol.GetAtoms():
             idx = atom.GetIdx()
             atom_envs = [
-                self._find_neighborhood(mol, idx, r) for r in range(1, self.radius + 1)
+                self._find_neighborhood(mol, idx, r, max_radii[idx])
+                for r in range(1, self.radius + 1)
             ]
             atoms_env[idx].extend(atom_envs)
 
         return atoms_env
 
+    @staticmethod
+    def _get_max_radii(distance_matrix: np.ndarray) -> np.ndarray:
+        """
+        Get the upper bound of neighborhood radius for each atom, i.e. the number
+        of bonds in the same molecule fragment. RDKit adds at least one new bond
+        for each radius, and it can go beyond distance to the farthest atom
+        by following ring bonds.
+        """
+        # atoms in disconnected fragments have very large distances, larger than
+        # any path in the molecule, so they are not reachable
+        num_atoms = len(distance_matrix)
+        reachable = distance_matrix < num_atoms
+        degrees = (distance_matrix == 1).sum(axis=1)
+        return (reachable @ degrees) // 2
+
     def _find_neighborhood(
-        self, mol: Mol, atom_idx: int, n_radius: int
-    ) -> Optional[str]:
+        self, mol: Mol, atom_idx: int, n_radius: int, max_radius: int
+    ) -> Optional[bytes]:
         """
-        Get the radius-hop neighborhood for a given atom. If there is no neighborhood
+        Get the radius-hop neighborhood for a given atom, as SMILES encoded into
+        bytes, ready for hashing. If there is no neighborhood
         of a given radius, e.g. 2-hop neighborhood for [Li]F with just two atoms,
         returns None.
         """
-        try:
-            env = FindAtomEnvironmentOfRadiusN(mol, atom_idx, n_radius)
-        except ValueError:
-            # "bad atom index" error happens if radius is larger than possible
+        # radius larger than possible is checked upfront, without calling RDKit
+        if n_radius > max_radius:
             return None
 
+        env = FindAtomEnvironmentOfRadiusN(mol, radius=n_radius, rootedAtAtom=atom_idx)
+
         atom_map: dict[int, int] = dict()
 
         submol = PathToSubmol(mol, env, atomMap=atom_map)
 
+        # SMILES have to be canonical with respect to the submolecule itself, so that
+        # the same environments in different molecules are written identically;
+        # canonical ranks of the whole molecule give different atom orderings
         if atom_idx in atom_map:
             return MolToSmiles(
                 submol,
                 rootedAtAtom=atom_map[atom_idx],
                 canonical=True,
                 isomericSmiles=False,
-            )
+            ).encode()
         else:
             return None
 
-    def _get_atom_pair_shingles(self, mol: Mol, atoms_envs: dict) -> list[bytes]:
+    def _get_atom_pair_shingles(
+        self, atoms_envs: dict, distance_matrix: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
         """
-        Gets a list of atom molecular shingles - circular structures around atom pairs,
+        Gets atom molecular shingles - circular structures around atom pairs,
         written as SMILES, separated by the bond distance between the two atoms along the
         shortest path.
-        """
-        shingles = []
-        distance_matrix = GetDistanceMatrix(mol)
-        num_atoms = mol.GetNumAtoms()
-        shingle_dict: dict[str, int] = defaultdict(int)
-
-        # Iterate through all pairs of atoms and radius. Shingles are stored in format:
-        # (radius i neighborhood of atom A) | (distance between atoms A and B) | (radius i neighborhood of atom B)
-        #
-        # If we want to count the shingles, we increment their value in shingle_dict
-        # After nested for-loop, all shingles, with their respective counts, will be added to atom_pairs list.
-        for idx_1, idx_2 in itertools.combinations(range(num_atoms), 2):
-            # distance_matrix consists of floats as integers, so they need to be converted to integers first
-            dist = str(int(distance_matrix[idx_1][idx_2]))
-            env_a = atoms_envs[idx_1]
-            env_b = atoms_envs[idx_2]
-
-            for i in range(self.radius):
-                env_a_radius = env_a[i]
-                env_b_radius = env_b[i]
-
-                # can be None if we couldn't get atom neighborhood of given radius
-                if not env_a_radius or not env_b_radius:
-                    continue
-
-                ordered = sorted([env_a_radius, env_b_radius])
-                shingle = f"{ordered[0]}|{dist}|{ordered[1]}"
-
-                if self.variant == "count":
-                    shingle_dict[shingle] += 1
-                else:
-                    shingles.append(shingle)
 
-        if self.variant == "count":
-            # shingle in format:
-            # (radius i neighborhood of atom A) | (distance between atoms A and B) | \
-            # (radius i neighborhood of atom B) | (shingle count)
-            shingle_count = [
-                f"{shingle}|{shingle_count}"
-                for shingle, shingle_count in shingle_dict.items()
-            ]
-            shingles.extend(shingle_count)
-
-        # convert strings to bytes for hashing
-        shingles = [shingle.encode() for shingle in shingles]
-
-        return shingles
+        Shingles are built by a compiled kernel, and returned packed into a single
+        byte buffer, with offsets of consecutive shingles.
+        """
+        num_atoms = len(distance_matrix)
+
+        # all atom pairs (A, B) with A < B, gathered at once from the upper triangle;
+        # distance_matrix consists of floats as integers, so they need to be converted
+        # to integers first
+        idx_1, idx_2 = np.triu_indices(num_atoms, k=1)
+        dists = distance_matrix[idx_1, idx_2].astype(np.int64)
+
+        # neighborhoods of all atoms, ordered by radius, packed into a byte buffer;
+        # they can be None if we couldn't get atom neighborhood of given radius
+        envs = [
+            atoms_envs[idx][i] for i in range(self.radius) for idx in range(num_atoms)
+        ]
+
+        # integer ids of neighborhoods, following lexicographic order of their SMILES,
+        # so that pairs are ordered by comparing ids; missing neighborhoods get -1
+        env_to_id = {env: i for i, env in enumerate(sorted(set(envs) - {None}))}
+        envs_ids = np.fromiter(
+            (env_to_id[env] if env is not None else -1 for env in envs),
+            dtype=np.int64,
+            count=len(envs),
+        )
+        envs = [env if env is not None else b"" for env in envs]
+
+        envs_lengths = np.fromiter(map(len, envs), dtype=np.int64, count=len(envs))
+        envs_offsets = np.zeros(len(envs) + 1, dtype=np.int64)
+        np.cumsum(envs_lengths, out=envs_offsets[1:])
+        envs_buffer = np.frombuffer(b"".join(envs), dtype=np.uint8)
+
+        return _build_shingles(
+            envs_buffer,
+            envs_offsets,
+            envs_ids,
+            idx_1,
+            idx_2,
+            dists,
+            num_atoms,
+            self.radius,
+        )
 
-    def _get_hash(self, shingle: bytes) -> int:
-        hash_bytes = hashlib.sha1(shingle, usedforsecurity=False).digest()
-        hash_value = struct.unpack("<I", hash_bytes[:4])[0]
-        return hash_value
+    def _combine_hashes_with_counts(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        For count variant, each unique shingle is hashed together with the number
+        of its occurrences. Shingle hashes and counts are combined numerically, like
+        in boost::hash_combine, with golden ratio constant.
+        """
+        hashes, counts = np.unique(hashes, return_counts=True)
+        hashes = hashes.astype(np.uint64) ^ (
+            counts.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        )
+        # keep 32 bits, as for shingle hashes
+        return (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+
+
+@njit(cache=True)
+def _fold_hashes(hashes: np.ndarray, fp_size: int) -> np.ndarray:
+    # modulo and counting fused into a single loop, without temporary arrays
+    fp = np.zeros(fp_size, dtype=np.int64)
+    for i in range(hashes.shape[0]):
+        fp[hashes[i] % fp_size] += 1
+    return fp
+
+
+@njit(cache=True)
+def _build_shingles(
+    envs_buffer: np.ndarray,
+    envs_offsets: np.ndarray,
+    envs_ids: np.ndarray,
+    idx_1: np.ndarray,
+    idx_2: np.ndarray,
+    dists: np.ndarray,
+    num_atoms: int,
+    radius: int,
+):
+    # Iterate through radii and all pairs of atoms. Shingles are stored in format:
+    # (radius i neighborhood of atom A) | (distance between atoms A and B) | (radius i neighborhood of atom B)
+    # with neighborhoods in lexicographic order, i.e. ordered by their ids. First pass
+    # computes output size, and second pass writes shingles directly into
+    # the preallocated buffer.
+    n_pairs = idx_1.shape[0]
+
+    dists_digits = np.ones(n_pairs, dtype=np.int64)
+    for p in range(n_pairs):
+        dist = dists[p]
+        while dist >= 10:
+            dist //= 10
+            dists_digits[p] += 1
+
+    n_shingles = 0
+    total_length = 0
+    for r in range(radius):
+        base = r * num_atoms
+        for p in range(n_pairs):
+            a = base + idx_1[p]
+            b = base + idx_2[p]
+            if envs_ids[a] >= 0 and envs_ids[b] >= 0:
+                n_shingles += 1
+                total_length += (
+                    envs_offsets[a + 1]
+                    - envs_offsets[a]
+                    + envs_offsets[b + 1]
+                    - envs_offsets[b]
+                    + dists_digits[p]
+                    + 2
+                )
+
+    buffer = np.empty(total_length, dtype=np.uint8)
+    offsets = np.zeros(n_shingles + 1, dtype=np.int64)
+    separator = np.uint8(124)  # "|"
+
+    pos = 0
+    shingle_idx = 0
+    for r in range(radius):
+        base = r * num_atoms
+        for p in range(n_pairs):
+            a = base + idx_1[p]
+            b = base + idx_2[p]
+            if envs_ids[a] < 0 or envs_ids[b] < 0:
+                continue
+
+            if envs_ids[a] > envs_ids[b]:
+                a, b = b, a
+
+            for i in range(envs_offsets[a], envs_offsets[a + 1]):
+                buffer[pos] = envs_buffer[i]
+                pos += 1
+
+            buffer[pos] = separator
+            pos += 1
+
+            dist = dists[p]
+            n_digits = dists_digits[p]
+            for d in range(n_digits - 1, -1, -1):
+                buffer[pos + d] = np.uint8(48 + dist % 10)  # ASCII digit
+                dist //= 10
+            pos += n_digits
+
+            buffer[pos] = separator
+            pos += 1
+
+            for i in range(envs_offsets[b], envs_offsets[b + 1]):
+                buffer[pos] = envs_buffer[i]
+                pos += 1
+
+            shingle_idx += 1
+            offsets[shingle_idx] = pos
+
+    return buffer, offsets
+
+
+@njit(cache=True)
+def _murmurhash3_32_batch(buffer: np.ndarray, offsets: np.ndarray, seed: int):
+    # MurmurHash3 x86_32, the same as sklearn.utils.murmurhash3_32(positive=True);
+    # computed on uint64 with explicit masking to keep 32-bit overflow semantics
+    mask = np.uint64(0xFFFFFFFF)
+    c1 = np.uint64(0xCC9E2D51)
+    c2 = np.uint64(0x1B873593)
+
+    n = offsets.shape[0] - 1
+    hashes = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        start = offsets[i]
+        length = offsets[i + 1] - start
+        h = np.uint64(seed) & mask
+
+        # body, 4-byte little endian blocks
+        n_blocks = length // 4
+        for block in range(n_blocks):
+            pos = start + 4 * block
+            k = (
+                np.uint64(buffer[pos])
+                | (np.uint64(buffer[pos + 1]) << np.uint64(8))
+                | (np.uint64(buffer[pos + 2]) << np.uint64(16))
+                | (np.uint64(buffer[pos + 3]) << np.uint64(24))
+            )
+            k = (k * c1) & mask
+            k = ((k << np.uint64(15)) | (k >> np.uint64(17))) & mask
+            k = (k * c2) & mask
+            h ^= k
+            h = ((h << np.uint64(13)) | (h >> np.uint64(19))) & mask
+            h = (h * np.uint64(5) + np.uint64(0xE6546B64)) & mask
+
+        # tail, remaining 0-3 bytes
+        tail = start + 4 * n_blocks
+        tail_len = length & 3
+        k = np.uint64(0)
+        if tail_len >= 3:
+            k ^= np.uint64(buffer[tail + 2]) << np.uint64(16)
+        if tail_len >= 2:
+            k ^= np.uint64(buffer[tail + 1]) << np.uint64(8)
+        if tail_len >= 1:
+            k ^= np.uint64(buffer[tail])
+            k = (k * c1) & mask
+            k = ((k << np.uint64(15)) | (k >> np.uint64(17))) & mask
+            k = (k * c2) & mask
+            h ^= k
+
+        # finalization mix
+        h ^= np.uint64(length)
+        h ^= h >> np.uint64(16)
+        h = (h * np.uint64(0x85EBCA6B)) & mask
+        h ^= h >> np.uint64(13)
+        h = (h * np.uint64(0xC2B2AE35)) & mask
+        h ^= h >> np.uint64(16)
+
+        hashes[i] = h
+
+    return hashes
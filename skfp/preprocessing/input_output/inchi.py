@@ -39,7 +39,7 @@ class MolFromInchiTransformer(BasePreprocessor):
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     suppress_warnings: bool, default=False
         Whether to suppress warnings and errors on loading molecules.
@@ -177,7 +177,7 @@ class MolToInchiTransformer(BasePreprocessor):
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     verbose : int or dict, default=0
         Controls the verbosity when processing molecules.
@@ -1,5 +1,6 @@
 import itertools
-from collections.abc import Sequence
+import math
+from collections.abc import Iterator, Sequence
 from typing import Callable, Optional, Union
 
 from joblib import effective_n_jobs
@@ -24,9 +25,17 @@ class ProgressParallel(Parallel):
         self._tqdm_settings: dict = tqdm_settings
 
     def __call__(self, *args, **kwargs):
+        if self.return_generator:
+            # progress bar has to stay open until all results are consumed
+            return self._call_generator(*args, **kwargs)
+
         with tqdm(**self._tqdm_settings) as self._pbar:
             return Parallel.__call__(self, *args, **kwargs)
 
+    def _call_generator(self, *args, **kwargs):
+        with tqdm(**self._tqdm_settings) as self._pbar:
+            yield from Parallel.__call__(self, *args, **kwargs)
+
     def print_progress(self) -> None:
         self._pbar.n = self.n_completed_tasks
         self._pbar.refresh()
@@ -39,7 +48,9 @@ def run_in_parallel(
     batch_size: Optional[int] = None,
     flatten_results: bool = False,
     verbose: Union[int, dict] = 0,
-) -> list:
+    prefer: Optional[str] = None,
+    return_as: str = "list",
+) -> Union[list, Iterator]:
     """Run a function in parallel on provided data in batches, using joblib.
 
     Results are returned in the same order as input data. ``func`` function must take
@@ -67,7 +78,7 @@ def run_in_parallel(
 
     batch_size : int, default=None
         Number of inputs processed in each batch. ``None`` divides input data into
-        equal-sized parts, as many as ``n_jobs``.
+        equal-sized parts, 4 times as many as ``n_jobs``, for load balancing.
 
     flatten_results : bool, default=False
         Whether to flatten the results, e.g. to change list of lists of integers
@@ -78,11 +89,26 @@ def run_in_parallel(
         tracking the processing of batches. If ``dict`` object is provided,
         it will be used to configure the ``tqdm`` progress bar.
 
+    prefer : {"processes", "threads"}, default=None
+        Soft hint for the joblib backend, passed to ``joblib.Parallel``. ``"threads"``
+        avoids pickling data for workers, and is useful when ``func`` spends most of
+        its time in code releasing the GIL, e.g. NumPy operations. Most RDKit
+        functions hold the GIL, so they don't benefit from threads. ``None`` uses
+        the default joblib backend. Backend set with :obj:`joblib.parallel_backend`
+        context takes precedence over this hint.
+
+    return_as : {"list", "generator"}, default="list"
+        Whether to return a list of results, or a generator, yielding results of
+        batches in order as they become available. Generator avoids keeping results
+        of all batches in memory at once, e.g. when they are written into
+        a preallocated array.
+
     Returns
     -------
-    X : list of length (n_samples,)
+    X : list of length (n_samples,) or generator
         The processed data. If processing function returns functions, this will be
-        a list of lists.
+        a list of lists. If ``return_as="generator"``, this is a generator yielding
+        the same elements.
 
     Examples
     --------
@@ -97,12 +123,14 @@ def run_in_parallel(
     n_jobs = effective_n_jobs(n_jobs)
 
     if batch_size is None:
-        batch_size = max(len(data) // n_jobs, 1)
+        # a few batches per worker, so that workers finishing early with fast
+        # batches can take over remaining ones, e.g. for small molecules
+        batch_size = max(len(data) // (4 * n_jobs), 1)
     elif batch_size <= 0:
         raise ValueError(f"batch_size must be positive, got {batch_size}")
 
     data_batch_gen = (data[i : i + batch_size] for i in range(0, len(data), batch_size))
-    num_batches = len(data) // batch_size
+    num_batches = math.ceil(len(data) / batch_size)
 
     if isinstance(verbose, int):
         tqdm_settings = {
@@ -118,14 +146,24 @@ def run_in_parallel(
             f"The `verbose` argument must be int or `dict`, got {type(verbose)}"
         )
 
+    if return_as not in {"list", "generator"}:
+        raise ValueError(f'return_as must be "list" or "generator", got {return_as}')
+
     if tqdm_settings["disable"]:
-        parallel = Parallel(n_jobs=n_jobs)
+        parallel = Parallel(n_jobs=n_jobs, prefer=prefer, return_as=return_as)
     else:
-        parallel = ProgressParallel(n_jobs=n_jobs, tqdm_settings=tqdm_settings)
+        parallel = ProgressParallel(
+            n_jobs=n_jobs,
+            prefer=prefer,
+            return_as=return_as,
+            tqdm_settings=tqdm_settings,
+        )
 
     results = parallel(delayed(func)(data_batch) for data_batch in data_batch_gen)
 
     if flatten_results:
-        results = list(itertools.chain.from_iterable(results))
+        results = itertools.chain.from_iterable(results)
+        if return_as == "list":
+            results = list(results)
 
     return results
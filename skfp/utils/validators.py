@@ -6,18 +6,22 @@ from rdkit.Chem.PropertyMol import PropertyMol
 
 
 def ensure_mols(X: Sequence[Any]) -> list[Mol]:
-    if not all(isinstance(x, (Mol, PropertyMol, str)) for x in X):
-        types = {type(x) for x in X}
-        raise ValueError(
-            f"Passed values must be one RDKit Mol objects or SMILES strings,"
-            f"got types: {types}"
-        )
-
-    mols = [MolFromSmiles(x) if isinstance(x, str) else x for x in X]
-
-    if any(x is None for x in mols):
-        idx = mols.index(None)
-        raise ValueError(f"Could not parse '{X[idx]}' at index {idx} as molecule")
+    # single pass over data, parsing SMILES and validating types at the same time
+    mols = []
+    for idx, x in enumerate(X):
+        if isinstance(x, str):
+            mol = MolFromSmiles(x)
+            if mol is None:
+                raise ValueError(f"Could not parse '{x}' at index {idx} as molecule")
+        elif isinstance(x, Mol):
+            mol = x
+        else:
+            types = {type(x) for x in X}
+            raise ValueError(
+                f"Passed values must be one RDKit Mol objects or SMILES strings,"
+                f"got types: {types}"
+            )
+        mols.append(mol)
 
     return mols
 
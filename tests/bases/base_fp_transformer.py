@@ -31,6 +31,23 @@ def test_base_transform_copy(smiles_list):
     assert np.array_equal(X_skfp, X_skfp_2)
 
 
+def test_base_parallel_equal_to_sequential(smiles_list):
+    X_seq = AtomPairFingerprint(count=True).transform(smiles_list)
+    X_parallel = AtomPairFingerprint(count=True, n_jobs=-1, batch_size=3).transform(
+        smiles_list
+    )
+    assert X_parallel.dtype == X_seq.dtype
+    assert np.array_equal(X_parallel, X_seq)
+
+
+def test_base_parallel_sparse_equal_to_sequential(smiles_list):
+    X_seq = AtomPairFingerprint(sparse=True).transform(smiles_list)
+    X_parallel = AtomPairFingerprint(sparse=True, n_jobs=-1, batch_size=3).transform(
+        smiles_list
+    )
+    assert np.array_equal(X_parallel.toarray(), X_seq.toarray())
+
+
 def test_base_invalid_params(smiles_list):
     maccs_fp = MACCSFingerprint(sparse=None)  # type: ignore
     with pytest.raises(InvalidParameterError):
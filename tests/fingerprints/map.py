@@ -1,7 +1,11 @@
 import numpy as np
+from datasketch import MinHash
+from rdkit.Chem import GetDistanceMatrix, MolFromSmiles, RenumberAtoms
 from scipy.sparse import csr_array
+from sklearn.utils import murmurhash3_32
 
 from skfp.fingerprints import MAPFingerprint
+from skfp.fingerprints.map import _murmurhash3_32_batch
 
 
 def test_map_bit_fingerprint(smallest_smiles_list, smallest_mols_list):
@@ -56,7 +60,7 @@ def test_map_raw_hashes_fingerprint(smallest_smiles_list, smallest_mols_list):
 
     assert np.array_equal(X_skfp, X_map)
     assert X_skfp.shape == (len(smallest_smiles_list), map_fp.fp_size)
-    assert np.issubdtype(X_skfp.dtype, np.integer)
+    assert X_skfp.dtype == np.uint32
 
 
 def test_map_sparse_bit_fingerprint(smallest_smiles_list, smallest_mols_list):
@@ -113,4 +117,215 @@ def test_map_sparse_raw_hashes_fingerprint(smallest_smiles_list, smallest_mols_l
 
     assert np.array_equal(X_skfp.data, X_map.data)
     assert X_skfp.shape == (len(smallest_smiles_list), map_fp.fp_size)
-    assert np.issubdtype(X_skfp.dtype, np.integer)
+    assert X_skfp.dtype == np.uint32
+
+
+def test_map_raw_hashes_equal_to_minhash(smallest_mols_list):
+    map_fp = MAPFingerprint(variant="raw_hashes")
+
+    for mol in smallest_mols_list:
+        distance_matrix = GetDistanceMatrix(mol)
+        atoms_envs = map_fp._get_atom_envs(mol, distance_matrix)
+        buffer, offsets = map_fp._get_atom_pair_shingles(atoms_envs, distance_matrix)
+        shingles = [
+            buffer[start:end].tobytes() for start, end in zip(offsets, offsets[1:])
+        ]
+
+        encoder = MinHash(num_perm=map_fp.fp_size, seed=map_fp.random_state)
+        encoder.update_batch(shingles)
+        expected = encoder.digest()
+
+        assert np.array_equal(map_fp._calculate_single_mol_fingerprint(mol), expected)
+
+
+def test_map_batch_hashes_match_murmurhash():
+    shingles = [b"", b"C", b"CC", b"C=O", b"c1ccccc1|3|CC(=O)O", b"[NH3+]|12|[O-]"]
+    offsets = np.cumsum([0] + [len(s) for s in shingles])
+    buffer = np.frombuffer(b"".join(shingles), dtype=np.uint8)
+
+    hashes = _murmurhash3_32_batch(buffer, offsets, 0)
+    expected = [murmurhash3_32(s, seed=0, positive=True) for s in shingles]
+
+    assert np.array_equal(hashes, expected)
+
+
+def test_map_atom_pair_shingles():
+    map_fp = MAPFingerprint(radius=2)
+    atoms_envs = {
+        0: [b"CC", b"CCO"],
+        1: [b"C", None],
+        2: [b"CO", b"CCO"],
+    }
+    distance_matrix = np.array([[0, 1, 12], [1, 0, 11], [12, 11, 0]], dtype=float)
+
+    buffer, offsets = map_fp._get_atom_pair_shingles(atoms_envs, distance_matrix)
+    shingles = [buffer[start:end].tobytes() for start, end in zip(offsets, offsets[1:])]
+
+    assert shingles == [
+        b"C|1|CC",
+        b"CC|12|CO",
+        b"C|11|CO",
+        b"CCO|12|CCO",
+    ]
+
+
+def test_map_atom_neighborhoods():
+    map_fp = MAPFingerprint(radius=3)
+    mol = MolFromSmiles("CCO")
+    max_radii = map_fp._get_max_radii(GetDistanceMatrix(mol))
+
+    envs = [
+        map_fp._find_neighborhood(mol, atom_idx=0, n_radius=r, max_radius=max_radii[0])
+        for r in [1, 2, 3]
+    ]
+    assert envs == [b"CC", b"CCO", None]
+
+    envs = [
+        map_fp._find_neighborhood(mol, atom_idx=2, n_radius=r, max_radius=max_radii[2])
+        for r in [1, 2, 3]
+    ]
+    assert envs == [b"OC", b"OCC", None]
+
+
+def test_map_ring_atom_neighborhoods():
+    # ring closing bonds are found one radius beyond the farthest atom
+    map_fp = MAPFingerprint(radius=4)
+
+    for smiles, n_radius in [("C1CC1", 2), ("c1ccccc1", 4)]:
+        mol = MolFromSmiles(smiles)
+        max_radii = map_fp._get_max_radii(GetDistanceMatrix(mol))
+
+        env = map_fp._find_neighborhood(
+            mol, atom_idx=0, n_radius=n_radius, max_radius=max_radii[0]
+        )
+        assert env is not None
+
+
+def test_map_neighborhood_rooted_at_atom():
+    # neighborhood of radius 1 around the last atom, not of radius 3 around atom 1
+    map_fp = MAPFingerprint(radius=1)
+    mol = MolFromSmiles("CCCO")
+    max_radii = map_fp._get_max_radii(GetDistanceMatrix(mol))
+
+    env = map_fp._find_neighborhood(
+        mol, atom_idx=3, n_radius=1, max_radius=max_radii[3]
+    )
+    assert env == b"OC"
+
+
+def test_map_symmetric_atoms_same_envs():
+    map_fp = MAPFingerprint(radius=2)
+    mol = MolFromSmiles("CC(C)(C)C")
+
+    atoms_envs = map_fp._get_atom_envs(mol, GetDistanceMatrix(mol))
+
+    # 4 methyl groups are symmetric
+    methyl_envs = [atoms_envs[idx] for idx in [0, 2, 3, 4]]
+    assert all(envs == [b"CC", b"CC(C)(C)C"] for envs in methyl_envs)
+    assert atoms_envs[1] == [b"C(C)(C)(C)C", None]
+
+
+def test_map_equivalent_atoms_different_envs():
+    # all atoms are equivalent without tie breaking, but ring sizes differ
+    map_fp = MAPFingerprint(radius=2)
+    mol = MolFromSmiles("C1CCC1.C1CCCCC1")
+
+    atoms_envs = map_fp._get_atom_envs(mol, GetDistanceMatrix(mol))
+
+    cyclobutane_envs = [atoms_envs[idx][1] for idx in range(4)]
+    cyclohexane_envs = [atoms_envs[idx][1] for idx in range(4, 10)]
+    assert len(set(cyclobutane_envs)) == 1
+    assert len(set(cyclohexane_envs)) == 1
+    assert cyclobutane_envs[0] != cyclohexane_envs[0]
+
+
+def test_map_atom_envs_radius_larger_than_molecule():
+    map_fp = MAPFingerprint(radius=3)
+
+    mol = MolFromSmiles("CCO.[Li]F")
+    distance_matrix = GetDistanceMatrix(mol)
+    atoms_envs = map_fp._get_atom_envs(mol, distance_matrix)
+
+    assert map_fp._get_max_radii(distance_matrix).tolist() == [2, 2, 2, 1, 1]
+    assert atoms_envs[0][:2] == [b"CC", b"CCO"]
+    assert atoms_envs[0][2] is None
+    assert atoms_envs[3][0] is not None
+    assert atoms_envs[3][1:] == [None, None]
+
+
+def test_map_atom_envs_fused_rings_equal_to_unbounded():
+    map_fp = MAPFingerprint(radius=6)
+
+    for smiles in ["O=C(O)C1CC1", "S=C1NCCS1", "O=C1OC2OC3OC(=O)C4C3CC2C14.CCO"]:
+        mol = MolFromSmiles(smiles)
+        atoms_envs = map_fp._get_atom_envs(mol, GetDistanceMatrix(mol))
+
+        for idx in range(mol.GetNumAtoms()):
+            expected = [
+                map_fp._find_neighborhood(
+                    mol, atom_idx=idx, n_radius=r, max_radius=mol.GetNumBonds()
+                )
+                for r in range(1, map_fp.radius + 1)
+            ]
+            assert atoms_envs[idx] == expected
+
+
+def test_map_duplicated_molecules():
+    map_fp = MAPFingerprint()
+    X_skfp = map_fp.transform(["CCO", "c1ccccc1", "OCC", "CCO"])
+
+    X_single = map_fp.transform(["CCO"])
+
+    assert np.array_equal(X_skfp[0], X_single[0])
+    assert np.array_equal(X_skfp[2], X_single[0])
+    assert np.array_equal(X_skfp[3], X_single[0])
+
+
+def test_map_renumbered_atoms(smallest_mols_list):
+    # duplicates are detected by canonical SMILES, so results must not depend on
+    # atom order, also when copies are computed in separate calls
+    mols = smallest_mols_list + [
+        MolFromSmiles("CSc1cc(SC)ncn1"),
+        MolFromSmiles("CC(C)c1cccc(C(C)C)c1O"),
+        MolFromSmiles("CN(C)c1nc(N(C)C)nc(N(C)C)n1"),
+    ]
+    renumbered_mols = [
+        RenumberAtoms(mol, list(reversed(range(mol.GetNumAtoms())))) for mol in mols
+    ]
+
+    for variant in ["bit", "count", "raw_hashes"]:
+        map_fp = MAPFingerprint(variant=variant)
+        X_skfp = map_fp.transform(mols)
+        X_renumbered = map_fp.transform(renumbered_mols)
+
+        assert np.array_equal(X_skfp, X_renumbered)
+
+
+def test_map_count_hashes_include_counts():
+    map_fp = MAPFingerprint(variant="count")
+
+    hashes_once = map_fp._combine_hashes_with_counts(np.array([1, 2]))
+    hashes_twice = map_fp._combine_hashes_with_counts(np.array([1, 1, 2]))
+
+    assert len(hashes_twice) == 2
+    assert hashes_once[0] != hashes_twice[0]
+    assert hashes_once[1] == hashes_twice[1]
+    assert np.all(hashes_twice < 2**32)
+
+
+def test_map_sparse_equal_to_dense(smallest_smiles_list):
+    for variant in ["bit", "count", "raw_hashes"]:
+        X_dense = MAPFingerprint(variant=variant).transform(smallest_smiles_list)
+        X_sparse = MAPFingerprint(variant=variant, sparse=True).transform(
+            smallest_smiles_list
+        )
+
+        assert isinstance(X_sparse, csr_array)
+        assert X_sparse.dtype == X_dense.dtype
+        assert np.array_equal(X_sparse.toarray(), X_dense)
+
+
+def test_map_parallel(smallest_smiles_list):
+    X_seq = MAPFingerprint().transform(smallest_smiles_list)
+    X_parallel = MAPFingerprint(n_jobs=-1).transform(smallest_smiles_list)
+    assert np.array_equal(X_seq, X_parallel)
@@ -46,6 +46,15 @@ def test_run_in_parallel_batch_size():
     assert result_sequential == result_parallel
 
 
+def test_run_in_parallel_default_batch_size():
+    func = lambda X: [len(X)]
+    data = list(range(100))
+    batch_sizes = run_in_parallel(func, data, n_jobs=2, flatten_results=True)
+
+    # 4 batches per worker by default, last one gets the remainder
+    assert batch_sizes == 8 * [12] + [4]
+
+
 def test_run_in_parallel_invalid_batch_size():
     func = lambda X: [x + 1 for x in X]
     data = list(range(100))
@@ -53,3 +62,33 @@ def test_run_in_parallel_invalid_batch_size():
         run_in_parallel(func, data, n_jobs=-1, batch_size=-1, flatten_results=True)
 
     assert "batch_size must be positive" in str(exc_info)
+
+
+def test_run_in_parallel_prefer_threads():
+    func = lambda X: [x + 1 for x in X]
+    data = list(range(100))
+    result_sequential = func(data)
+    result_parallel = run_in_parallel(
+        func, data, n_jobs=-1, flatten_results=True, prefer="threads"
+    )
+    assert result_sequential == result_parallel
+
+
+def test_run_in_parallel_return_generator():
+    func = lambda X: [x + 1 for x in X]
+    data = list(range(100))
+    result_sequential = func(data)
+    result_parallel = run_in_parallel(
+        func, data, n_jobs=-1, flatten_results=True, return_as="generator"
+    )
+    assert not isinstance(result_parallel, list)
+    assert result_sequential == list(result_parallel)
+
+
+def test_run_in_parallel_invalid_return_as():
+    func = lambda X: [x + 1 for x in X]
+    data = list(range(100))
+    with pytest.raises(ValueError) as exc_info:
+        run_in_parallel(func, data, n_jobs=-1, return_as="tuple")
+
+    assert "return_as must be" in str(exc_info)